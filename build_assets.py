@@ -0,0 +1,153 @@
+"""Build step for static assets.
+
+Minifies static/style.css, self-hosts the Poppins font (latin subset), makes
+resized JPEG/WebP variants of static/background.jpg, fingerprints every output
+file name with its content hash and writes gzip (and brotli, when installed)
+copies next to each file. new.py serves the results from /assets/ with
+far-future immutable cache headers:
+
+    python build_assets.py
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import requests
+import sys
+from PIL import Image
+from file_utils import atomic_write
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = "static"
+ASSET_DIR = os.path.join(STATIC_DIR, "dist")
+# Written outside ASSET_DIR: its name never changes, so it must not be served as immutable
+MANIFEST_FILE = "asset-manifest.json"
+CSS_SOURCE = "style.css"
+BACKGROUND_SOURCE = "background.jpg"
+# Background widths to generate; the widest is capped at the source image width
+BACKGROUND_WIDTHS = (800, 1600)
+FONTS_URL = "https://fonts.googleapis.com/css2?family=Poppins:wght@300;500;700&display=swap"
+FONT_SUBSETS = ("latin",)
+COMPRESSIBLE = (".css", ".js", ".svg", ".json")
+
+def fingerprint(name, content):
+    """Content-hashed file name, e.g. style.css -> style.3f2a9c1b7d4e.css"""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+def write_asset(name, content, manifest):
+    """Write a fingerprinted asset plus precompressed copies; returns its file name"""
+    filename = fingerprint(name, content)
+    with open(os.path.join(ASSET_DIR, filename), "wb") as f:
+        f.write(content)
+    if filename.endswith(COMPRESSIBLE):
+        with open(os.path.join(ASSET_DIR, filename + ".gz"), "wb") as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli:
+            with open(os.path.join(ASSET_DIR, filename + ".br"), "wb") as f:
+                f.write(brotli.compress(content, quality=11))
+    manifest[name] = filename
+    return filename
+
+def minify_css(css):
+    """Strip comments and redundant whitespace from a stylesheet"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{}:;,>])\s*", r"\1", css)
+    css = css.replace(";}", "}")
+    return css.strip()
+
+def build_fonts(manifest):
+    """Download the Google Fonts stylesheet and its font files; returns @font-face CSS"""
+    # A modern user agent makes Google Fonts serve woff2 split by unicode subset
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+    }
+    # Any failure aborts the build: pages only drop the Google Fonts link once
+    # the manifest has self-hosted fonts, so a fontless build must not ship
+    response = requests.get(FONTS_URL, headers=headers, timeout=10)
+    response.raise_for_status()
+    faces = []
+    for subset, face in re.findall(r"/\*\s*([\w-]+)\s*\*/\s*(@font-face\s*{[^}]*})", response.text):
+        if subset not in FONT_SUBSETS:
+            continue
+        url = re.search(r"url\((https://[^)]+)\)", face).group(1)
+        weight = re.search(r"font-weight:\s*(\d+)", face).group(1)
+        font = requests.get(url, timeout=10)
+        font.raise_for_status()
+        filename = write_asset(f"poppins-{subset}-{weight}.woff2", font.content, manifest)
+        faces.append(face.replace(url, filename))
+    if not faces:
+        raise ValueError("no matching @font-face rules in the Google Fonts stylesheet")
+    print(f"Self-hosted {len(faces)} font files")
+    return "\n".join(faces)
+
+def build_background(manifest):
+    """Resized JPEG and WebP variants of the background; returns {width: (jpg, webp)}"""
+    img = Image.open(os.path.join(STATIC_DIR, BACKGROUND_SOURCE)).convert("RGB")
+    widths = sorted({min(w, img.width) for w in BACKGROUND_WIDTHS})
+    variants = {}
+    for width in widths:
+        resized = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+        stem = os.path.splitext(BACKGROUND_SOURCE)[0]
+
+        jpg = io.BytesIO()
+        resized.save(jpg, "JPEG", quality=80, optimize=True, progressive=True)
+        webp = io.BytesIO()
+        resized.save(webp, "WEBP", quality=75, method=6)
+        variants[width] = (
+            write_asset(f"{stem}-{width}.jpg", jpg.getvalue(), manifest),
+            write_asset(f"{stem}-{width}.webp", webp.getvalue(), manifest),
+        )
+    print(f"Built background variants at widths {widths}")
+    return variants
+
+def background_css(variants):
+    """Rules choosing the smallest adequate background, WebP where supported"""
+    def rule(width):
+        jpg, webp = variants[width]
+        return (f'body{{background-image:url("{jpg}");'
+                f'background-image:image-set(url("{webp}") type("image/webp"),url("{jpg}") type("image/jpeg"))}}')
+    widths = sorted(variants)
+    # Largest variant is the default; narrower breakpoints come last so they win
+    overrides = [f"@media (max-width:{w}px){{{rule(w)}}}" for w in reversed(widths[:-1])]
+    return rule(widths[-1]) + "".join(overrides)
+
+def build():
+    # Earlier builds are left in place: pages already cached by browsers may
+    # still reference their fingerprinted names
+    os.makedirs(ASSET_DIR, exist_ok=True)
+    manifest = {}
+
+    fonts = build_fonts(manifest)
+    variants = build_background(manifest)
+
+    with open(os.path.join(STATIC_DIR, CSS_SOURCE)) as f:
+        css = f.read()
+    # Point the default background at the largest variant, then add responsive overrides
+    css = re.sub(r"""url\(["']?%s["']?\)""" % re.escape(BACKGROUND_SOURCE),
+                 f'url("{variants[max(variants)][0]}")', css)
+    css = "\n".join([fonts, css, background_css(variants)])
+    write_asset(CSS_SOURCE, minify_css(css).encode("utf-8"), manifest)
+
+    # Replace atomically so the server never reads a half-written manifest
+    content = json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8")
+    atomic_write(MANIFEST_FILE, lambda f: f.write(content))
+    print(f"Wrote {len(manifest)} assets to {ASSET_DIR}")
+    if not brotli:
+        print("brotli not installed; only gzip copies were written")
+    return manifest
+
+if __name__ == "__main__":
+    try:
+        build()
+    except Exception as e:
+        # The previous manifest is left in place, so the server keeps its last good build
+        print(f"Asset build failed: {e}")
+        sys.exit(1)
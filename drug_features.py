@@ -0,0 +1,25 @@
+# Feature helpers shared by the web app (new.py) and the training job (retrain.py).
+# Kept free of Flask and app state so retrain.py can import them without starting the app.
+
+# Map pregnancy categories to numerical values
+preg_map = {'A':1, 'B':2, 'C':3, 'D':4, 'X':5}
+
+# The model's side-effect feature is the number of SIDE_EFFECT_CHUNK-character
+# chunks of side-effect text (at least 1), i.e. len(extract_side_effects(...))
+SIDE_EFFECT_CHUNK = 200
+
+def extract_side_effects(info):
+    """Extract side effects from multiple FDA fields and format them"""
+    # Combine all possible side effect sources
+    sources = [info.get(field) for field in [
+        "adverse_reactions", "warnings", "precautions", 
+        "boxed_warning", "contraindications", "general_precautions"]]
+    
+    # Clean and split into readable chunks
+    text = " ".join(str(s) for s in sources if s)
+    return [text[i:i+SIDE_EFFECT_CHUNK] for i in range(0, len(text), SIDE_EFFECT_CHUNK)] if text else ["No side effects data"]
+
+def side_effect_chunks(text_lengths):
+    """Vectorised len(extract_side_effects(...)) from side-effect text lengths (pandas Series)"""
+    chunks = (text_lengths.fillna(0) + SIDE_EFFECT_CHUNK - 1) // SIDE_EFFECT_CHUNK
+    return chunks.clip(lower=1)
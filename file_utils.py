@@ -0,0 +1,24 @@
+import os
+import tempfile
+
+def atomic_write(path, write):
+    """Write a file via a unique temp file in the same directory and os.replace it into place.
+
+    `write` is called with the open binary file. Readers never see a partial
+    file, and concurrent writers of the same path never share a temp file.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; the server may run as a different user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+import joblib
+from file_utils import atomic_write
+
+# Versioned model artifacts live in MODEL_DIR as rating_model-<version>.pkl.
+# CURRENT names the live version and PREVIOUS the one before it (for rollback).
+MODEL_DIR = "models"
+CURRENT_FILE = "CURRENT"
+PREVIOUS_FILE = "PREVIOUS"
+KEEP_VERSIONS = 3
+
+def artifact_path(version, model_dir=MODEL_DIR):
+    """Path of the model artifact for a given version"""
+    return os.path.join(model_dir, f"rating_model-{version}.pkl")
+
+def _read_pointer(name, model_dir=MODEL_DIR):
+    try:
+        with open(os.path.join(model_dir, name)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def _write_pointer(name, version, model_dir=MODEL_DIR):
+    atomic_write(os.path.join(model_dir, name), lambda f: f.write(version.encode("utf-8")))
+
+def current_version(model_dir=MODEL_DIR):
+    """Version the server should be serving, or None if nothing is published"""
+    return _read_pointer(CURRENT_FILE, model_dir)
+
+def previous_version(model_dir=MODEL_DIR):
+    """Version that a rollback would return to"""
+    return _read_pointer(PREVIOUS_FILE, model_dir)
+
+def publish_model(model, model_dir=MODEL_DIR):
+    """Atomically write a new model version and make it current"""
+    os.makedirs(model_dir, exist_ok=True)
+    version = time.strftime("%Y%m%d-%H%M%S")
+    # Avoid clobbering a version published within the same second
+    suffix = 1
+    while os.path.exists(artifact_path(version, model_dir)):
+        version = f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+        suffix += 1
+
+    atomic_write(artifact_path(version, model_dir), lambda f: joblib.dump(model, f))
+
+    old = current_version(model_dir)
+    if old:
+        _write_pointer(PREVIOUS_FILE, old, model_dir)
+    _write_pointer(CURRENT_FILE, version, model_dir)
+    _prune_versions(model_dir)
+    return version
+
+def rollback(model_dir=MODEL_DIR):
+    """Swap CURRENT and PREVIOUS; returns the version now being served"""
+    old, prev = current_version(model_dir), previous_version(model_dir)
+    if not prev or not os.path.exists(artifact_path(prev, model_dir)):
+        raise RuntimeError("No previous model version to roll back to")
+    _write_pointer(CURRENT_FILE, prev, model_dir)
+    if old:
+        _write_pointer(PREVIOUS_FILE, old, model_dir)
+    return prev
+
+def _prune_versions(model_dir=MODEL_DIR):
+    """Delete old artifacts, always keeping the current and previous versions"""
+    keep = {current_version(model_dir), previous_version(model_dir)}
+    artifacts = sorted(
+        (f for f in os.listdir(model_dir) if f.startswith("rating_model-") and f.endswith(".pkl")),
+        key=lambda f: os.path.getmtime(os.path.join(model_dir, f)),
+        reverse=True)
+    for name in artifacts[KEEP_VERSIONS:]:
+        version = name[len("rating_model-"):-len(".pkl")]
+        if version not in keep:
+            os.remove(os.path.join(model_dir, name))
+
+class ModelStore:
+    """Holds the live model and hot-swaps it when a new version is published.
+
+    Requests call get() and keep using the model object they were handed, so a
+    swap never interrupts a prediction that is already in progress.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, fallback=None, check_interval=5.0):
+        self.model_dir = model_dir
+        self.fallback = fallback
+        self.check_interval = check_interval
+        self.version = None
+        self._model = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the live model, reloading first if a new version was published"""
+        if self._model is None or time.monotonic() - self._last_check >= self.check_interval:
+            self.refresh()
+        return self._model
+
+    def refresh(self):
+        """Load CURRENT if it differs from the version being served"""
+        with self._lock:
+            self._last_check = time.monotonic()
+            try:
+                version = current_version(self.model_dir)
+            except OSError as e:
+                # e.g. an unreadable pointer file; keep serving the model we have
+                print(f"Model version check failed: {e}")
+                version = None
+            if version and version != self.version:
+                try:
+                    model = joblib.load(artifact_path(version, self.model_dir))
+                    self._model, self.version = model, version
+                    print(f"Loaded rating model version {version}")
+                except Exception as e:
+                    # Keep serving the model we already have
+                    print(f"Model reload failed for version {version}: {e}")
+            if self._model is None and self.fallback:
+                self._model = self.fallback()
+                self.version = "fallback"
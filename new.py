@@ -1,4 +1,4 @@
-from flask import Flask, request, render_template
+from flask import Flask, request, render_template, redirect, url_for, make_response, send_from_directory
 import requests
 import joblib
 import numpy as np
@@ -7,135 +7,40 @@ from bs4 import BeautifulSoup
 import re
 import time
 import os
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
-import pandas as pd
+import hashlib
+import io
+import mimetypes
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+from PIL import Image
+from model_store import ModelStore
+from drug_features import extract_side_effects, preg_map
+from file_utils import atomic_write
+from reviews import ReviewStore
 
 app = Flask(__name__)
 
-# Enhanced model loading with fallback
-try:
-    model = joblib.load("enhanced_rating_model.pkl")
-    print("Loaded enhanced rating model")
-except:
-    try:
-        model = joblib.load("rating_model.pkl")
-        print("Loaded original rating model")
-    except:
-        print("No model found. Creating enhanced model...")
-        model = create_enhanced_model()
-
-# Map pregnancy categories to numerical values
-preg_map = {'A':1, 'B':2, 'C':3, 'D':4, 'X':5}
-
-def create_enhanced_model():
-    """Create an enhanced model using comprehensive drug data"""
-    try:
-        # Try to load your existing dataset
-        try:
-            df = pd.read_csv("drug_dataset.csv")
-            print(f"Loaded your dataset with {len(df)} records")
-            
-            # Use your existing features or create enhanced ones
-            if 'side_effects_count' in df.columns and 'pregnancy_category' in df.columns:
-                X = df[['side_effects_count', 'pregnancy_category']]
-                y = df['rating']
-            else:
-                # Create enhanced training data
-                training_data = create_comprehensive_training_data()
-                df = pd.DataFrame(training_data)
-                X = df[['side_effects_count', 'pregnancy_category_num']]
-                y = df['rating']
-                
-        except FileNotFoundError:
-            # Create comprehensive training data from common drugs
-            training_data = create_comprehensive_training_data()
-            df = pd.DataFrame(training_data)
-            X = df[['side_effects_count', 'pregnancy_category_num']]
-            y = df['rating']
-        
-        # Train enhanced model
-        model = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=10)
-        model.fit(X, y)
-        
-        # Save the enhanced model
-        joblib.dump(model, "enhanced_rating_model.pkl")
-        print("Enhanced model created and saved")
-        return model
-        
-    except Exception as e:
-        print(f"Enhanced model creation failed: {e}")
-        return create_fallback_model()
-
-def create_comprehensive_training_data():
-    """Create comprehensive training data from common drugs"""
-    common_drugs = [
-        "aspirin", "ibuprofen", "paracetamol", "amoxicillin", "atorvastatin",
-        "metformin", "lisinopril", "levothyroxine", "amlodipine", "omeprazole",
-        "simvastatin", "albuterol", "metoprolol", "prednisone", "azithromycin"
-    ]
-    
-    training_data = []
-    
-    for drug in common_drugs:
+# Rating model is published by retrain.py into models/ and hot-swapped while serving.
+# Legacy single-file models are used until a versioned model has been published.
+def load_legacy_model():
+    """Load a pre-versioning model file, or build the fallback model"""
+    for path in ("enhanced_rating_model.pkl", "rating_model.pkl"):
         try:
-            # Get FDA data for the drug
-            response = requests.get(
-                f"https://api.fda.gov/drug/label.json?search=openfda.generic_name:{drug}&limit=1",
-                timeout=5
-            )
-            data = response.json().get("results", [None])[0]
-            
-            if data:
-                # Extract features
-                side_effects = extract_side_effects(data)
-                preg_cat = data.get("pregnancy_category", ["C"])[0] if isinstance(
-                    data.get("pregnancy_category"), list) else data.get("pregnancy_category", "C")
-                
-                # Calculate realistic rating
-                rating = calculate_realistic_rating(len(side_effects), preg_cat)
-                
-                training_data.append({
-                    'side_effects_count': len(side_effects),
-                    'pregnancy_category_num': preg_map.get(preg_cat, 3),
-                    'rating': rating
-                })
-                
-        except Exception as e:
-            print(f"Error processing {drug}: {e}")
+            legacy = joblib.load(path)
+            print(f"Loaded legacy rating model {path}")
+            return legacy
+        except Exception:
             continue
-    
-    # Add some default training examples
-    default_examples = [
-        {'side_effects_count': 2, 'pregnancy_category_num': 1, 'rating': 9.5},  # Very safe
-        {'side_effects_count': 5, 'pregnancy_category_num': 2, 'rating': 8.0},  # Safe
-        {'side_effects_count': 8, 'pregnancy_category_num': 3, 'rating': 6.0},  # Moderate
-        {'side_effects_count': 15, 'pregnancy_category_num': 4, 'rating': 3.0}, # Risky
-        {'side_effects_count': 10, 'pregnancy_category_num': 5, 'rating': 1.5}, # Very risky
-    ]
-    training_data.extend(default_examples)
-    
-    return training_data
+    print("No model found. Run retrain.py to build one; using fallback model")
+    return create_fallback_model()
 
-def calculate_realistic_rating(side_effects_count, preg_cat):
-    """Calculate realistic rating between 1-10"""
-    rating = 5.0  # Base rating
-    
-    # Pregnancy category adjustment
-    preg_adjustment = {'A': +2, 'B': +1, 'C': 0, 'D': -2, 'X': -4}
-    rating += preg_adjustment.get(preg_cat, 0)
-    
-    # Side effects adjustment
-    if side_effects_count < 5:
-        rating += 2
-    elif side_effects_count < 10:
-        rating += 1
-    elif side_effects_count > 20:
-        rating -= 2
-    elif side_effects_count > 40:
-        rating -= 3
-    
-    return max(1.0, min(10.0, rating))
+model_store = ModelStore(fallback=load_legacy_model)
+
+# Community reviews submitted through /reviews, blended into predicted ratings
+review_store = ReviewStore()
+# The model's prediction counts as this many reviews when blending in community ratings
+COMMUNITY_PRIOR_WEIGHT = 10
 
 def create_fallback_model():
     """Create a reasonable fallback model"""
@@ -156,16 +61,13 @@ def create_fallback_model():
 
 # KEEP ALL YOUR EXISTING FUNCTIONS EXACTLY THE SAME FROM HERE ↓
 
-def extract_side_effects(info):
-    """Extract side effects from multiple FDA fields and format them"""
-    # Combine all possible side effect sources
-    sources = [info.get(field) for field in [
-        "adverse_reactions", "warnings", "precautions", 
-        "boxed_warning", "contraindications", "general_precautions"]]
-    
-    # Clean and split into readable chunks
-    text = " ".join(str(s) for s in sources if s)
-    return [text[i:i+200] for i in range(0, len(text), 200)] if text else ["No side effects data"]
+def get_pregnancy_category(info):
+    """Pregnancy category from an FDA label, defaulting to C"""
+    preg_cat = info.get("pregnancy_category", "C")
+    return preg_cat[0] if isinstance(preg_cat, list) else preg_cat
+
+NO_ALTERNATIVES = "No alternatives found"
+ALTERNATIVES_FAILED = "Alternative search failed"
 
 def get_drug_alternatives(drug_name):
     """Find alternative drugs using RxNorm API"""
@@ -175,7 +77,7 @@ def get_drug_alternatives(drug_name):
             f"https://rxnav.nlm.nih.gov/REST/rxcui.json?name={drug_name}&search=1"
         ).json().get('idGroup',{}).get('rxnormId',[None])[0]
         
-        if not rxcui: return ["No alternatives found"]
+        if not rxcui: return [NO_ALTERNATIVES]
         
         # Get related drugs (both ingredients and brand names)
         concepts = requests.get(
@@ -186,16 +88,25 @@ def get_drug_alternatives(drug_name):
         alts = {p['name'] for g in concepts if g.get('conceptProperties') 
                for p in g['conceptProperties'] if p.get('name') and p['name'].lower() != drug_name.lower()}
         
-        return list(alts)[:5] or ["No alternatives found"]
+        return list(alts)[:5] or [NO_ALTERNATIVES]
         
     except Exception as e:
         print(f"Alternative drugs error: {e}")
-        return ["Alternative search failed"]
+        return [ALTERNATIVES_FAILED]
 
-def predict_rating(side_effects, preg_cat):
+def blend_community_rating(rating, drug_name):
+    """Shrink the model rating towards the drug's mean community review rating"""
+    stats = review_store.stats(drug_name) if drug_name else None
+    if not stats:
+        return rating, 0
+    blended = (rating * COMMUNITY_PRIOR_WEIGHT + stats['mean'] * stats['count']) / (COMMUNITY_PRIOR_WEIGHT + stats['count'])
+    return blended, stats['count']
+
+def predict_rating(side_effects, preg_cat, drug_name=None):
     """Predict drug rating using trained model"""
     try:
-        rating = model.predict([[len(side_effects), preg_map.get(preg_cat,3)]])[0]
+        rating = model_store.get().predict([[len(side_effects), preg_map.get(preg_cat,3)]])[0]
+        rating, review_count = blend_community_rating(rating, drug_name)
         # Ensure rating is between 1-10
         scaled_rating = max(1.0, min(10.0, rating))
         return {
@@ -204,12 +115,91 @@ def predict_rating(side_effects, preg_cat):
             'Pregnant Woman Risk': {
                 'A':'Safe', 'B':'Likely Safe', 'C':'Caution',
                 'D':'Unsafe', 'X':'Contraindicated'}.get(preg_cat,'Unknown'),
-            'Pregnancy Category': preg_cat
+            'Pregnancy Category': preg_cat,
+            'Community Reviews': review_count
         }
     except Exception as e:
         print(f"Prediction error: {e}")
         return None
 
+def predict_ratings_batch(side_effect_counts, preg_cats, drug_names):
+    """Predict ratings for several drugs with a single model call"""
+    X = np.array([[count, preg_map.get(cat, 3)] for count, cat in zip(side_effect_counts, preg_cats)])
+    ratings = model_store.get().predict(X)
+    return [round(max(1.0, min(10.0, blend_community_rating(rating, name)[0])), 1)
+            for rating, name in zip(ratings, drug_names)]
+
+FDA_BATCH_LIMIT = 100
+
+def fetch_fda_labels(drug_names):
+    """Fetch FDA labels for several drugs with combined openFDA queries, keyed by requested name"""
+    # Best effort: one OR'ed query usually covers every name, but a common generic
+    # can have hundreds of labels and fill the page on its own. Any names still
+    # unmatched are re-queried by themselves, until all match or a query adds nothing.
+    labels = {}
+    remaining = list(drug_names)
+    for _ in range(len(drug_names)):
+        # Space-separated (+) clauses are OR'ed by openFDA; match generic or brand names
+        phrases = [quote(f'"{name}"') for name in remaining]
+        clauses = "+".join(f"openfda.generic_name:{p}+openfda.brand_name:{p}" for p in phrases)
+        results = requests.get(
+            f"https://api.fda.gov/drug/label.json?search={clauses}&limit={FDA_BATCH_LIMIT}",
+            timeout=10
+        ).json().get("results", [])
+        
+        # Keep only the first label seen for each requested name
+        for label in results:
+            openfda = label.get("openfda", {})
+            label_names = {n.lower() for n in openfda.get("generic_name", []) + openfda.get("brand_name", [])}
+            for name in remaining:
+                if name.lower() in label_names and name not in labels:
+                    labels[name] = label
+        
+        unmatched = [n for n in remaining if n not in labels]
+        if not unmatched or len(unmatched) == len(remaining):
+            break
+        remaining = unmatched
+    return labels
+
+def get_alternative_features(alternatives):
+    """FDA label features for each alternative; scoring is done separately so it stays current"""
+    names = [a for a in alternatives if a not in (NO_ALTERNATIVES, ALTERNATIVES_FAILED)]
+    if not names:
+        return [{'name': a, 'side_effects_count': None, 'pregnancy_category': None} for a in alternatives]
+    try:
+        labels = fetch_fda_labels(names)
+    except Exception as e:
+        print(f"Alternative label lookup error: {e}")
+        labels = {}
+    
+    return [{
+        'name': n,
+        'side_effects_count': len(extract_side_effects(labels[n])) if n in labels else None,
+        'pregnancy_category': get_pregnancy_category(labels[n]) if n in labels else None
+    } for n in names]
+
+def score_alternatives(features):
+    """Attach predicted ratings to alternatives' features, best rated first"""
+    found = [f for f in features if f['side_effects_count'] is not None]
+    try:
+        ratings = predict_ratings_batch(
+            [f['side_effects_count'] for f in found],
+            [f['pregnancy_category'] for f in found],
+            [f['name'] for f in found]) if found else []
+    except Exception as e:
+        # A scoring failure only costs the ratings, not the whole results page
+        print(f"Alternative scoring error: {e}")
+        return [{'name': f['name'], 'rating': None, 'pregnancy_category': f['pregnancy_category']}
+                for f in features]
+    
+    scored = [{'name': f['name'], 'rating': r, 'pregnancy_category': f['pregnancy_category']}
+              for f, r in zip(found, ratings)]
+    scored.sort(key=lambda a: a['rating'], reverse=True)
+    # Alternatives without an FDA label are listed last, unscored
+    scored += [{'name': f['name'], 'rating': None, 'pregnancy_category': None}
+               for f in features if f['side_effects_count'] is None]
+    return scored
+
 def get_drug_image(drug_name):
     """Get drug packaging image from multiple sources"""
     try:
@@ -240,6 +230,79 @@ def get_drug_image(drug_name):
         print(f"Image search error: {e}")
         return None
 
+# Resolved drug images are downloaded once, shrunk to display size and stored
+# under the SHA-256 of the resized bytes, so cached files never change
+IMAGE_CACHE_DIR = os.path.join(app.root_path, "image_cache")
+IMAGE_DISPLAY_SIZE = (250, 250)
+IMAGE_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_MAX_AGE = 365 * 24 * 60 * 60
+# Source URL -> cached file name, persisted as image_cache/index/<sha256 of url>
+# so images are not downloaded again after a restart
+IMAGE_INDEX_DIR = os.path.join(IMAGE_CACHE_DIR, "index")
+_image_sources = {}
+
+def _image_index_path(image_url):
+    return os.path.join(IMAGE_INDEX_DIR, hashlib.sha256(image_url.encode("utf-8")).hexdigest())
+
+def _lookup_cached_image(image_url):
+    """Cached file name for a source URL from memory or the on-disk index"""
+    filename = _image_sources.get(image_url)
+    if filename:
+        return filename
+    try:
+        with open(_image_index_path(image_url)) as f:
+            filename = f.read().strip()
+    except OSError:
+        return None
+    if filename and os.path.exists(os.path.join(IMAGE_CACHE_DIR, filename)):
+        _image_sources[image_url] = filename
+        return filename
+    return None
+
+def cache_drug_image(image_url):
+    """Fetch an image, resize it and store it in the on-disk cache; returns the file name"""
+    if not image_url:
+        return None
+    filename = _lookup_cached_image(image_url)
+    if filename:
+        return filename
+    try:
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        }
+        # Close the streamed response so a partial read releases the pooled connection
+        with requests.get(image_url, headers=headers, timeout=10, stream=True) as response:
+            response.raise_for_status()
+            raw = response.raw.read(IMAGE_MAX_BYTES + 1, decode_content=True)
+        if len(raw) > IMAGE_MAX_BYTES:
+            raise ValueError("image larger than IMAGE_MAX_BYTES")
+        
+        img = Image.open(io.BytesIO(raw))
+        img.thumbnail(IMAGE_DISPLAY_SIZE)
+        # Flatten transparency onto white so the thumbnail can be stored as JPEG
+        if img.mode != "RGB":
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        
+        buffer = io.BytesIO()
+        img.save(buffer, "JPEG", quality=85, optimize=True)
+        content = buffer.getvalue()
+        filename = hashlib.sha256(content).hexdigest() + ".jpg"
+        
+        path = os.path.join(IMAGE_CACHE_DIR, filename)
+        if not os.path.exists(path):
+            atomic_write(path, lambda f: f.write(content))
+        atomic_write(_image_index_path(image_url), lambda f: f.write(filename.encode("utf-8")))
+        
+        _image_sources[image_url] = filename
+        return filename
+        
+    except Exception as e:
+        print(f"Image cache error: {e}")
+        return None
+
 def _get_image_from_drugs_com(drug_name):
     """Try to get medicine packaging/box images from Drugs.com"""
     try:
@@ -502,6 +565,12 @@ def get_drug_prices(drug_name):
         print(f"Price fetch error: {e}")
         return []
 
+def get_cached_image_url(drug_name):
+    """Local thumbnail URL for the drug image, or the original URL if caching failed"""
+    image_url = get_drug_image(drug_name)
+    filename = cache_drug_image(image_url)
+    return url_for("cached_image", filename=filename) if filename else image_url
+
 def get_drug_details(drug_name):
     """Main function to get all drug data from FDA API"""
     try:
@@ -515,17 +584,17 @@ def get_drug_details(drug_name):
         
         # Process all data
         side_effects = extract_side_effects(data)
-        preg_cat = data.get("pregnancy_category",["C"])[0] if isinstance(
-            data.get("pregnancy_category"),list) else data.get("pregnancy_category","C")
+        preg_cat = get_pregnancy_category(data)
         
         return {
-            "prediction": predict_rating(side_effects, preg_cat),
+            "prediction": predict_rating(side_effects, preg_cat, drug_name),
+            "pregnancy_category": preg_cat,
             "side_effects": side_effects,
             "warnings": data.get("warnings",["No warnings"]),
             "usage": data.get("indications_and_usage",["No usage info"]),
             "brand_names": list(set(data.get("openfda",{}).get("brand_name",[drug_name]))),
-            "alternative": get_drug_alternatives(drug_name),
-            "image_url": get_drug_image(drug_name),
+            "alternative_features": get_alternative_features(get_drug_alternatives(drug_name)),
+            "image_url": get_cached_image_url(drug_name),
             "prices": get_drug_prices(drug_name)
         }
         
@@ -534,26 +603,212 @@ def get_drug_details(drug_name):
     except Exception as e:
         return {"error": f"Processing error: {str(e)}"}
 
+# Results caching: fetched drug details are kept for DETAILS_CACHE_TTL seconds,
+# and the rendered page is kept per drug alongside the data version it was built from.
+# Both caches hold at most RESULTS_CACHE_SIZE drugs, least recently used evicted first.
+DETAILS_CACHE_TTL = 60 * 60
+RESULTS_MAX_AGE = 5 * 60
+RESULTS_CACHE_SIZE = 256
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (stored_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            now = time.time()
+            # Prune expired entries so drugs that are never requested again don't linger
+            for k in [k for k, (stored_at, _) in self._entries.items() if now - stored_at >= self.ttl]:
+                del self._entries[k]
+            self._entries[key] = (now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+_details_cache = LRUCache(RESULTS_CACHE_SIZE, DETAILS_CACHE_TTL)   # drug key -> (fetched_at, details)
+_page_cache = LRUCache(RESULTS_CACHE_SIZE, DETAILS_CACHE_TTL)      # drug key -> (page version, rendered html)
+
+def _drug_key(drug_name):
+    """Normalise a drug name for use as a cache key"""
+    return drug_name.strip().lower()
+
+def get_cached_drug_details(drug_name):
+    """Return (fetched_at, details), reusing recent successful lookups"""
+    key = _drug_key(drug_name)
+    entry = _details_cache.get(key)
+    if entry:
+        return entry
+    
+    data = get_drug_details(drug_name)
+    entry = (time.time(), data)
+    # Only cache successful lookups so transient API errors are retried
+    if "error" not in data:
+        _details_cache.set(key, entry)
+    return entry
+
+def data_version(data):
+    """Stable hash of everything a results page is rendered from (used as ETag)"""
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def render_results(data):
+    """Render the results page for a successful drug lookup"""
+    return render_template("index.html",
+        prediction=data["prediction"],
+        extra_info={
+            "Side Effects": data["side_effects"],
+            "Usage": data["usage"][0] if isinstance(data["usage"],list) else data["usage"],
+            "Warnings": data["warnings"][0] if isinstance(data["warnings"],list) else data["warnings"],
+            "Brand Names": ", ".join(data["brand_names"]),
+            "Alternative Drugs": data["alternative"],
+            "Pregnancy Category": data["prediction"]["Pregnancy Category"]
+        },
+        image_url=data.get("image_url"),
+        prices=data.get("prices", []))
+
 @app.route("/", methods=["GET","POST"])
 def index():
     """Main Flask route handling requests"""
     if request.method == "POST":
-        data = get_drug_details(request.form["drug_name"])
-        if "error" in data: 
-            return render_template("index.html", error=data["error"])
-        return render_template("index.html",
-            prediction=data["prediction"],
-            extra_info={
-                "Side Effects": data["side_effects"],
-                "Usage": data["usage"][0] if isinstance(data["usage"],list) else data["usage"],
-                "Warnings": data["warnings"][0] if isinstance(data["warnings"],list) else data["warnings"],
-                "Brand Names": ", ".join(data["brand_names"]),
-                "Alternative Drugs": data["alternative"],
-                "Pregnancy Category": data["prediction"]["Pregnancy Category"]
-            },
-            image_url=data.get("image_url"),
-            prices=data.get("prices", []))
+        drug_name = request.form["drug_name"].strip()
+        if not drug_name:
+            return render_template("index.html", error="Please enter a drug name")
+        # Post/Redirect/Get so results live at a cacheable URL
+        return redirect(url_for("drug_results", drug_name=drug_name), code=303)
     return render_template("index.html")
 
+@app.route("/drug/<path:drug_name>")
+def drug_results(drug_name):
+    """GET-addressable results page with ETag support"""
+    _, data = get_cached_drug_details(drug_name)
+    if "error" in data:
+        response = make_response(render_template("index.html", error=data["error"]))
+        response.cache_control.no_store = True
+        return response
+    
+    # Re-score cached details so a hot-swapped model and new community reviews
+    # show up without a re-fetch; only FDA-derived features are cached
+    # predict_rating returns None on failure; fall back to the prediction made at fetch time
+    prediction = predict_rating(
+        data["side_effects"], data["pregnancy_category"], drug_name) or data.get("prediction")
+    if not prediction:
+        response = make_response(render_template("index.html", error="Rating model unavailable, please try again"))
+        response.cache_control.no_store = True
+        return response
+    data = dict(data, prediction=prediction,
+        alternative=score_alternatives(data["alternative_features"]))
+    
+    key = _drug_key(drug_name)
+    # The page links fingerprinted asset names, so a rebuild must change the version too
+    version = data_version(dict(data, assets=load_asset_manifest()))
+    cached = _page_cache.get(key)
+    if cached and cached[0] == version:
+        html = cached[1]
+    else:
+        html = render_results(data)
+        _page_cache.set(key, (version, html))
+    
+    # No Last-Modified: the page also depends on the live model and community
+    # reviews, so only the content hash (ETag) reliably says whether it changed
+    response = make_response(html)
+    response.set_etag(version)
+    response.cache_control.public = True
+    response.cache_control.max_age = RESULTS_MAX_AGE
+    # Turns the response into a 304 when the client's copy is still current
+    return response.make_conditional(request)
+
+@app.route("/reviews", methods=["GET","POST"])
+def reviews():
+    """Submit and list community drug reviews"""
+    if request.method == "POST":
+        try:
+            rating = float(request.form["rating"])
+        except (KeyError, ValueError):
+            rating = None
+        drug_name = request.form.get("drug_name", "").strip()
+        name = request.form.get("name", "").strip()
+        text = request.form.get("text", "").strip()
+        if not (drug_name and name and text) or rating is None or not 1 <= rating <= 10:
+            return render_template("reviews.html", reviews=review_store.recent(),
+                error="Please fill in every field with a rating from 1 to 10"), 400
+        review_store.add(drug_name, name, rating, text, time.time())
+        return redirect(url_for("reviews"), code=303)
+    return render_template("reviews.html", reviews=review_store.recent())
+
+@app.route("/images/<filename>")
+def cached_image(filename):
+    """Serve a cached drug thumbnail; names are content hashes so they never go stale"""
+    response = send_from_directory(IMAGE_CACHE_DIR, filename, max_age=IMAGE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# Fingerprinted assets built by build_assets.py: names change whenever content
+# does, so they can be cached forever; gzip/brotli copies are served when accepted
+ASSET_DIR = os.path.join(app.root_path, "static", "dist")
+# The manifest is not fingerprinted, so it lives outside the served directory
+ASSET_MANIFEST = os.path.join(app.root_path, "asset-manifest.json")
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+_asset_manifest = {"mtime": None, "files": {}}
+
+def load_asset_manifest():
+    """Logical -> fingerprinted asset names, re-read when the manifest is rebuilt"""
+    try:
+        mtime = os.path.getmtime(ASSET_MANIFEST)
+    except OSError:
+        return {}
+    if mtime != _asset_manifest["mtime"]:
+        with open(ASSET_MANIFEST) as f:
+            _asset_manifest["files"] = json.load(f)
+        _asset_manifest["mtime"] = mtime
+    return _asset_manifest["files"]
+
+@app.context_processor
+def asset_helpers():
+    def asset_url(name):
+        """URL of a built asset, or the unbuilt static file during development"""
+        filename = load_asset_manifest().get(name)
+        if filename:
+            return url_for("built_asset", filename=filename)
+        return url_for("static", filename=name)
+    def fonts_self_hosted():
+        """Whether the build bundled the web fonts; otherwise pages link Google Fonts"""
+        return any(name.endswith(".woff2") for name in load_asset_manifest())
+    return {"asset_url": asset_url, "fonts_self_hosted": fonts_self_hosted}
+
+@app.route("/assets/<filename>")
+def built_asset(filename):
+    """Serve a fingerprinted asset, precompressed when the client accepts it"""
+    served, encoding = filename, None
+    for candidate, ext in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[candidate] > 0 and os.path.exists(os.path.join(ASSET_DIR, filename + ext)):
+            served, encoding = filename + ext, candidate
+            break
+    
+    response = send_from_directory(ASSET_DIR, served, max_age=ASSET_MAX_AGE,
+        mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
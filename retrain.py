@@ -0,0 +1,309 @@
+"""Standalone training job for the rating model.
+
+Trains outside the web process and publishes a versioned artifact into models/,
+which the running server picks up without a restart:
+
+    python retrain.py              # train on all cores and publish
+    python retrain.py --dataset reviews.xlsx --chunksize 50000
+    python retrain.py --rollback   # switch the server back to the previous version
+"""
+import argparse
+import hashlib
+import os
+import sys
+import requests
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from file_utils import atomic_write
+from model_store import publish_model, rollback, current_version, MODEL_DIR
+from drug_features import extract_side_effects, preg_map, side_effect_chunks
+
+# Review datasets are streamed in chunks with compact dtypes and reduced to one
+# row of features per drug; the result is cached as parquet keyed by the source
+# file's path, size and mtime so unchanged datasets are never parsed twice
+DATASET_PATH = "drug_dataset.csv"
+FEATURE_CACHE_DIR = "cache"
+CHUNK_SIZE = 100_000
+DRUG_COLUMNS = ('drug_name', 'drugName', 'drug')
+REVIEW_DTYPES = {
+    'pregnancy_category': 'category',
+    'rating': 'float32',
+    'side_effects_count': 'float32',
+}
+
+def _read_header(path):
+    """Column names of a CSV or Excel dataset without loading it"""
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True)
+        try:
+            header = next(wb.active.iter_rows(max_row=1, values_only=True))
+        finally:
+            wb.close()
+        return [str(c) for c in header if c is not None]
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def _iter_chunks(path, usecols, dtypes, chunksize):
+    """Yield DataFrame chunks of the selected columns from a CSV or Excel file"""
+    if not path.lower().endswith(('.xlsx', '.xlsm')):
+        yield from pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize)
+        return
+    
+    # read_excel has no chunksize, so stream rows from openpyxl's read-only mode
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(c) for c in next(rows)]
+        positions = [header.index(c) for c in usecols]
+        batch = []
+        for row in rows:
+            batch.append([row[i] for i in positions])
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=usecols).astype(dtypes)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=usecols).astype(dtypes)
+    finally:
+        wb.close()
+
+def _pregnancy_category_num(values):
+    """Pregnancy categories as numbers, accepting letters (A-X) or numbers already mapped"""
+    numeric = pd.to_numeric(values, errors='coerce')
+    letters = values.astype(str).str.strip().str.upper().map(preg_map)
+    return numeric.fillna(letters).fillna(3).astype('int8')
+
+def load_row_dataset(path, chunksize=CHUNK_SIZE):
+    """Older per-row format (side_effects_count, pregnancy_category, rating; no drug column)"""
+    usecols = ['side_effects_count', 'pregnancy_category', 'rating']
+    dtypes = {'side_effects_count': 'float32', 'pregnancy_category': 'object', 'rating': 'float32'}
+    parts = []
+    for chunk in _iter_chunks(path, usecols, dtypes, chunksize):
+        chunk = chunk.dropna(subset=['side_effects_count', 'rating'])
+        parts.append(pd.DataFrame({
+            'side_effects_count': chunk['side_effects_count'],
+            'pregnancy_category_num': _pregnancy_category_num(chunk['pregnancy_category']),
+            'rating': chunk['rating'],
+        }))
+    features = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    if features.empty:
+        raise ValueError(f"{path} contains no usable rows")
+    # Every row is one observation, so weight rows equally
+    features['review_count'] = 1
+    return features
+
+def aggregate_review_dataset(path, chunksize=CHUNK_SIZE):
+    """Stream a review dataset and build per-drug training features incrementally"""
+    columns = _read_header(path)
+    if (not any(c in columns for c in DRUG_COLUMNS)
+            and {'side_effects_count', 'pregnancy_category', 'rating'} <= set(columns)):
+        return load_row_dataset(path, chunksize)
+    drug_col = next((c for c in DRUG_COLUMNS if c in columns), None)
+    side_col = next((c for c in ('side_effects_count', 'side_effects') if c in columns), None)
+    if drug_col is None or 'rating' not in columns or side_col is None:
+        raise ValueError(f"{path} needs a drug name, rating and side effects column")
+    
+    usecols = [drug_col, 'rating', side_col]
+    if 'pregnancy_category' in columns:
+        usecols.append('pregnancy_category')
+    dtypes = {c: REVIEW_DTYPES.get(c, 'object') for c in usecols}
+    dtypes[drug_col] = 'category'
+    
+    totals = None
+    preg_cats = pd.Series(dtype=object)
+    rows = 0
+    for chunk in _iter_chunks(path, usecols, dtypes, chunksize):
+        rows += len(chunk)
+        chunk = chunk.dropna(subset=[drug_col, 'rating'])
+        if side_col == 'side_effects':
+            # Free-text side effects: measure them the way the server does for FDA labels
+            counts = side_effect_chunks(chunk['side_effects'].str.len())
+            chunk = chunk.assign(side_effects_count=counts.astype('float32'))
+        
+        # Sum in float64 so millions of float32 ratings don't lose precision
+        grouped = chunk.groupby(drug_col, observed=True)
+        part = pd.DataFrame({
+            'review_count': grouped['rating'].count().astype('float64'),
+            'rating_sum': grouped['rating'].sum().astype('float64'),
+            'side_effects_sum': grouped['side_effects_count'].sum().astype('float64'),
+        })
+        part.index = part.index.astype(str)
+        totals = part if totals is None else totals.add(part, fill_value=0)
+        
+        if 'pregnancy_category' in chunk.columns:
+            first = chunk.dropna(subset=['pregnancy_category']).groupby(drug_col, observed=True)['pregnancy_category'].first()
+            first.index = first.index.astype(str)
+            preg_cats = preg_cats.combine_first(first.astype(str))
+        print(f"Processed {rows} rows")
+    
+    if totals is None or totals.empty:
+        raise ValueError(f"{path} contains no usable reviews")
+    
+    features = pd.DataFrame({
+        'side_effects_count': (totals['side_effects_sum'] / totals['review_count']).astype('float32'),
+        'pregnancy_category_num': _pregnancy_category_num(preg_cats.reindex(totals.index)),
+        'rating': (totals['rating_sum'] / totals['review_count']).astype('float32'),
+        'review_count': totals['review_count'].astype('int64'),
+    })
+    features.index.name = 'drug_name'
+    return features
+
+def _feature_cache_path(path):
+    """Cache file name tied to the dataset's path, size and modification time"""
+    stat = os.stat(path)
+    signature = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    digest = hashlib.sha1(signature.encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(FEATURE_CACHE_DIR, f"{stem}-{digest}.parquet")
+
+def load_review_features(path=DATASET_PATH, chunksize=CHUNK_SIZE):
+    """Per-drug features for a review dataset, from the parquet cache when possible"""
+    cache_path = _feature_cache_path(path)
+    if os.path.exists(cache_path):
+        try:
+            features = pd.read_parquet(cache_path)
+            print(f"Loaded cached features from {cache_path}")
+            return features
+        except Exception as e:
+            print(f"Feature cache unreadable ({e}); re-parsing {path}")
+    
+    features = aggregate_review_dataset(path, chunksize)
+    try:
+        atomic_write(cache_path, lambda f: features.to_parquet(f))
+        print(f"Cached features to {cache_path}")
+    except ImportError:
+        print("Parquet support (pyarrow) not installed; features not cached")
+    return features
+
+def create_enhanced_model(n_jobs=-1, dataset_path=DATASET_PATH, chunksize=CHUNK_SIZE):
+    """Create an enhanced model using comprehensive drug data"""
+    try:
+        sample_weight = None
+        # Try to load your existing review dataset
+        try:
+            features = load_review_features(dataset_path, chunksize)
+            print(f"Loaded your dataset: {features['review_count'].sum()} reviews of {len(features)} drugs")
+            X = features[['side_effects_count', 'pregnancy_category_num']]
+            y = features['rating']
+            # Drugs with more reviews have more reliable mean ratings
+            sample_weight = features['review_count']
+                
+        except (FileNotFoundError, ValueError) as e:
+            # Create comprehensive training data from common drugs
+            print(f"Review dataset not usable ({e}); building training data from FDA labels")
+            training_data = create_comprehensive_training_data()
+            df = pd.DataFrame(training_data)
+            X = df[['side_effects_count', 'pregnancy_category_num']]
+            y = df['rating']
+        
+        # Train enhanced model, spreading the trees across all cores
+        model = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=10, n_jobs=n_jobs)
+        model.fit(X, y, sample_weight=sample_weight)
+        print("Enhanced model trained")
+        return model
+        
+    except Exception as e:
+        print(f"Enhanced model creation failed: {e}")
+        return None
+
+def create_comprehensive_training_data():
+    """Create comprehensive training data from common drugs"""
+    common_drugs = [
+        "aspirin", "ibuprofen", "paracetamol", "amoxicillin", "atorvastatin",
+        "metformin", "lisinopril", "levothyroxine", "amlodipine", "omeprazole",
+        "simvastatin", "albuterol", "metoprolol", "prednisone", "azithromycin"
+    ]
+    
+    training_data = []
+    
+    for drug in common_drugs:
+        try:
+            # Get FDA data for the drug
+            response = requests.get(
+                f"https://api.fda.gov/drug/label.json?search=openfda.generic_name:{drug}&limit=1",
+                timeout=5
+            )
+            data = response.json().get("results", [None])[0]
+            
+            if data:
+                # Extract features
+                side_effects = extract_side_effects(data)
+                preg_cat = data.get("pregnancy_category", ["C"])[0] if isinstance(
+                    data.get("pregnancy_category"), list) else data.get("pregnancy_category", "C")
+                
+                # Calculate realistic rating
+                rating = calculate_realistic_rating(len(side_effects), preg_cat)
+                
+                training_data.append({
+                    'side_effects_count': len(side_effects),
+                    'pregnancy_category_num': preg_map.get(preg_cat, 3),
+                    'rating': rating
+                })
+                
+        except Exception as e:
+            print(f"Error processing {drug}: {e}")
+            continue
+    
+    # Add some default training examples
+    default_examples = [
+        {'side_effects_count': 2, 'pregnancy_category_num': 1, 'rating': 9.5},  # Very safe
+        {'side_effects_count': 5, 'pregnancy_category_num': 2, 'rating': 8.0},  # Safe
+        {'side_effects_count': 8, 'pregnancy_category_num': 3, 'rating': 6.0},  # Moderate
+        {'side_effects_count': 15, 'pregnancy_category_num': 4, 'rating': 3.0}, # Risky
+        {'side_effects_count': 10, 'pregnancy_category_num': 5, 'rating': 1.5}, # Very risky
+    ]
+    training_data.extend(default_examples)
+    
+    return training_data
+
+def calculate_realistic_rating(side_effects_count, preg_cat):
+    """Calculate realistic rating between 1-10"""
+    rating = 5.0  # Base rating
+    
+    # Pregnancy category adjustment
+    preg_adjustment = {'A': +2, 'B': +1, 'C': 0, 'D': -2, 'X': -4}
+    rating += preg_adjustment.get(preg_cat, 0)
+    
+    # Side effects adjustment
+    if side_effects_count < 5:
+        rating += 2
+    elif side_effects_count < 10:
+        rating += 1
+    elif side_effects_count > 20:
+        rating -= 2
+    elif side_effects_count > 40:
+        rating -= 3
+    
+    return max(1.0, min(10.0, rating))
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and publish the drug rating model")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="cores to train on (-1 = all)")
+    parser.add_argument("--model-dir", default=MODEL_DIR, help="where versioned models are stored")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="review dataset (.csv or .xlsx)")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE, help="rows parsed per chunk")
+    parser.add_argument("--rollback", action="store_true", help="restore the previous model version")
+    args = parser.parse_args()
+    
+    if args.rollback:
+        try:
+            version = rollback(args.model_dir)
+        except RuntimeError as e:
+            print(e)
+            return 1
+        print(f"Rolled back to model version {version}")
+        return 0
+    
+    model = create_enhanced_model(n_jobs=args.n_jobs, dataset_path=args.dataset, chunksize=args.chunksize)
+    if model is None:
+        print(f"Training failed; still serving version {current_version(args.model_dir)}")
+        return 1
+    
+    # The server predicts a row at a time; parallel dispatch would only add overhead there
+    model.n_jobs = None
+    version = publish_model(model, args.model_dir)
+    print(f"Published model version {version}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
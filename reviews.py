@@ -0,0 +1,181 @@
+import atexit
+import sqlite3
+import threading
+from contextlib import closing
+
+# User reviews are buffered in memory and written to SQLite in batches, each
+# batch in a single transaction. Per-drug rating aggregates (count, mean and
+# Welford's M2 for variance) are updated as reviews arrive, so lookups never
+# re-scan the reviews table. Each process only writes the aggregates of its own
+# new reviews, merged into the stored row inside the flush transaction, so
+# several worker processes can share one database.
+REVIEWS_DB = "reviews.db"
+FLUSH_BATCH_SIZE = 50
+FLUSH_INTERVAL = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    drug TEXT NOT NULL,
+    name TEXT NOT NULL,
+    rating REAL NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS drug_stats (
+    drug TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    m2 REAL NOT NULL
+);
+"""
+
+def combine_stats(a, b):
+    """Merge two (count, mean, m2) aggregates (Chan et al. parallel variance)"""
+    if not a or not a[0]:
+        return list(b) if b else [0, 0.0, 0.0]
+    if not b or not b[0]:
+        return list(a)
+    count = a[0] + b[0]
+    delta = b[1] - a[1]
+    mean = a[1] + delta * b[0] / count
+    m2 = a[2] + b[2] + delta * delta * a[0] * b[0] / count
+    return [count, mean, m2]
+
+def review_key(drug_name):
+    """Normalise a drug name for storage and lookup"""
+    return drug_name.strip().lower()
+
+class ReviewStore:
+    """Buffered review writer with incrementally maintained per-drug aggregates"""
+
+    def __init__(self, db_path=REVIEWS_DB, batch_size=FLUSH_BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._stats = {}    # drug -> [count, mean, m2], stored plus pending reviews
+        self._deltas = {}   # drug -> [count, mean, m2] of pending reviews only
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()  # set when a full batch is waiting
+
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            conn.executescript(SCHEMA)
+        self.reload_stats()
+
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def add(self, drug_name, name, rating, text, created_at):
+        """Queue a review and fold its rating into the drug's running aggregates"""
+        drug = review_key(drug_name)
+        with self._lock:
+            self._pending.append((drug, name, float(rating), text, created_at))
+            # Welford's online update of count, mean and M2
+            for table in (self._stats, self._deltas):
+                count, mean, m2 = table.get(drug, [0, 0.0, 0.0])
+                count += 1
+                delta = rating - mean
+                mean += delta / count
+                m2 += delta * (rating - mean)
+                table[drug] = [count, mean, m2]
+            full = len(self._pending) >= self.batch_size
+        if full:
+            # Hand the write to the background flusher; requests never wait on SQLite
+            self._wake.set()
+
+    def stats(self, drug_name):
+        """Community rating aggregates for a drug, or None if it has no reviews"""
+        entry = self._stats.get(review_key(drug_name))
+        if not entry:
+            return None
+        count, mean, m2 = entry
+        return {
+            'count': count,
+            'mean': mean,
+            'variance': m2 / (count - 1) if count > 1 else 0.0
+        }
+
+    def recent(self, limit=50):
+        """Most recent reviews, newest first, including ones not yet written"""
+        with self._lock:
+            pending = list(reversed(self._pending))
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            stored = conn.execute(
+                "SELECT drug, name, rating, text, created_at FROM reviews ORDER BY id DESC LIMIT ?",
+                (limit,)).fetchall()
+        rows = (pending + stored)[:limit]
+        return [dict(zip(('drug', 'name', 'rating', 'text', 'created_at'), row)) for row in rows]
+
+    def reload_stats(self):
+        """Refresh aggregates from the database, picking up other processes' reviews"""
+        # Holding the flush lock keeps a batch from being committed between the
+        # read below and combining with the still-pending deltas
+        with self._flush_lock:
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                stored = {drug: [count, mean, m2] for drug, count, mean, m2 in
+                          conn.execute("SELECT drug, count, mean, m2 FROM drug_stats")}
+            with self._lock:
+                for drug, delta in self._deltas.items():
+                    stored[drug] = combine_stats(stored.get(drug), delta)
+                self._stats = stored
+
+    def flush(self):
+        """Write buffered reviews and merge their aggregates in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                deltas, self._deltas = self._deltas, {}
+            if not batch:
+                return
+            try:
+                with closing(sqlite3.connect(self.db_path, isolation_level=None)) as conn:
+                    # IMMEDIATE takes the write lock before reading the stored
+                    # aggregates, so concurrent writers cannot interleave
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        conn.executemany(
+                            "INSERT INTO reviews (drug, name, rating, text, created_at) VALUES (?, ?, ?, ?, ?)",
+                            batch)
+                        for drug, delta in deltas.items():
+                            row = conn.execute(
+                                "SELECT count, mean, m2 FROM drug_stats WHERE drug = ?", (drug,)).fetchone()
+                            count, mean, m2 = combine_stats(row, delta)
+                            conn.execute(
+                                "INSERT OR REPLACE INTO drug_stats (drug, count, mean, m2) VALUES (?, ?, ?, ?)",
+                                (drug, count, mean, m2))
+                        conn.execute("COMMIT")
+                    except Exception:
+                        conn.execute("ROLLBACK")
+                        raise
+            except sqlite3.Error as e:
+                # Put the batch back so the next flush retries it
+                print(f"Review flush error: {e}")
+                with self._lock:
+                    self._pending = batch + self._pending
+                    for drug, delta in deltas.items():
+                        self._deltas[drug] = combine_stats(delta, self._deltas.get(drug))
+                return
+
+    def close(self):
+        """Stop the background flusher and write anything still buffered"""
+        self._stop.set()
+        self._wake.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+
+    def _flush_periodically(self):
+        # Flush every flush_interval seconds, or as soon as add() fills a batch
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            self.flush()
+            try:
+                self.reload_stats()
+            except sqlite3.Error as e:
+                print(f"Review stats reload error: {e}")